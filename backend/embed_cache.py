@@ -0,0 +1,80 @@
+"""
+Persistent chunk embedding cache - LMDB store of float16 vectors keyed by sha256(backend:model|text)
+"""
+import functools
+import hashlib
+import threading
+from typing import Callable, List
+
+import numpy as np
+
+# Initial LMDB map size; doubled whenever a write fills it (Windows preallocates the whole map on disk)
+INITIAL_MAP_SIZE = 1 << 26
+
+
+@functools.lru_cache(maxsize=None)
+def _open_env(path: str):
+    """One LMDB environment (and write lock) per path per process: LMDB forbids opening an env twice"""
+    import lmdb
+
+    return lmdb.open(path, map_size=INITIAL_MAP_SIZE, subdir=True, lock=True), threading.Lock()
+
+
+class EmbedCache:
+    """Looks chunk embeddings up by content so unchanged text is never re-embedded"""
+    def __init__(self, path: str, model_name: str):
+        """Open (or create) the LMDB environment at path; raises ImportError when lmdb is missing.
+
+        model_name should identify the embedding backend too (e.g. "onnx:<model>"), since int8 ONNX
+        and fp32 sentence-transformers vectors of the same model differ.
+        """
+        self.model_name = model_name
+        self.env, self._write_lock = _open_env(path)
+
+    def _key(self, text: str) -> bytes:
+        """Cache key for one chunk under the current model"""
+        return hashlib.sha256(f"{self.model_name}|{text}".encode("utf-8")).digest()
+
+    def _put_many(self, items: List[tuple]):
+        """Store (key, float32 vector) pairs as float16, growing the map whenever it fills up"""
+        import lmdb
+
+        with self._write_lock:
+            while True:
+                try:
+                    with self.env.begin(write=True) as txn:
+                        for key, vector in items:
+                            txn.put(key, vector.astype(np.float16).tobytes())
+                    return
+                except lmdb.MapFullError:
+                    self.env.set_mapsize(self.env.info()["map_size"] * 2)
+
+    def get_or_compute(
+        self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """float32 embeddings for texts, calling embed_fn only on the cache misses"""
+        import lmdb
+
+        keys = [self._key(text) for text in texts]
+        vectors: List[np.ndarray] = [None] * len(texts)
+
+        with self.env.begin() as txn:
+            for i, key in enumerate(keys):
+                value = txn.get(key)
+                if value is not None:
+                    vectors[i] = np.frombuffer(value, dtype=np.float16)
+
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            computed = np.asarray(embed_fn([texts[i] for i in misses]), dtype=np.float32)
+            for i, vector in zip(misses, computed):
+                vectors[i] = vector
+            try:
+                self._put_many([(keys[i], vectors[i]) for i in misses])
+            except lmdb.Error as e:
+                # A cache write failure must not fail ingestion: the vectors are already computed
+                print(f"⚠️  Could not write embedding cache: {e}")
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32)
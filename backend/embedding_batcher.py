@@ -0,0 +1,72 @@
+"""
+Async micro-batcher - coalesces concurrent embedding requests into a single forward pass
+"""
+import asyncio
+from typing import Callable, List, Optional
+
+
+class EmbeddingBatcher:
+    """Collects texts that arrive within a short window and embeds them in one batch"""
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005
+    ):
+        """embed_fn is a batch embedding function such as Embeddings.embed_documents"""
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background batching task (must be called inside the running event loop)"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background batching task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a forward pass with any concurrent callers"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        """Pop up to max_batch_size items (or whatever arrives within max_wait) and embed them together"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Run the (blocking) model call off the event loop
+            try:
+                vectors = await asyncio.to_thread(self.embed_fn, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -3,13 +3,17 @@ FastAPI Backend for RAG Chatbot
 """
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
-import shutil
+import json
+import asyncio
+import aiofiles
 from pathlib import Path
 from dotenv import load_dotenv
-from rag_core import RAGChatbot
+from rag_core import DOCUMENT_SUFFIXES, RAGChatbot, iter_documents
+from embedding_batcher import EmbeddingBatcher
 
 # Load environment variables from parent directory (.env is in root)
 env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -53,6 +57,34 @@ rag_chatbot = RAGChatbot(
 print("🚀 Performing initial document sync...")
 rag_chatbot.sync_folder(str(UPLOAD_DIR))
 
+# Coalesces question embeddings from concurrent /chat requests into one forward pass
+embedding_batcher = EmbeddingBatcher(rag_chatbot.embeddings.embed_documents)
+
+async def question_embedding(question: str) -> List[float]:
+    """Question embedding from the chatbot's LRU cache, else from the micro-batcher (then cached)"""
+    query_vector = rag_chatbot.cached_query_embedding(question)
+    if query_vector is None:
+        query_vector = await embedding_batcher.embed(RAGChatbot.normalize_question(question))
+        rag_chatbot.remember_query_embedding(question, query_vector)
+    return query_vector
+
+@app.on_event("startup")
+async def start_embedding_batcher():
+    """Start the embedding micro-batcher inside the server's event loop"""
+    embedding_batcher.start()
+
+@app.on_event("startup")
+async def warmup_embeddings():
+    """Pay the model's first-call cost (device transfer, kernel selection) before the first user does"""
+    await asyncio.to_thread(rag_chatbot.embeddings.embed_query, "warmup")
+    await asyncio.to_thread(rag_chatbot.embeddings.embed_documents, ["warmup"] * 32)
+    print("🔥 Embedding model warmed up")
+
+@app.on_event("shutdown")
+async def stop_embedding_batcher():
+    """Stop the embedding micro-batcher"""
+    await embedding_batcher.stop()
+
 # Pydantic models
 class ChatRequest(BaseModel):
     question: str
@@ -107,19 +139,24 @@ async def upload_documents(files: List[UploadFile] = File(...)):
     try:
         uploaded_files = []
         for file in files:
-            if not (file.filename.endswith('.pdf') or file.filename.endswith('.docx')):
+            if not file.filename.lower().endswith(DOCUMENT_SUFFIXES):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unsupported file type: {file.filename}. Only PDF and DOCX are supported."
                 )
             
+            # Stream the upload to disk in 1 MB chunks without blocking the event loop, keeping
+            # the bytes to index from memory (no folder rescan/re-read)
             file_path = UPLOAD_DIR / file.filename
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            chunks = []
+            async with aiofiles.open(file_path, "wb") as out:
+                while chunk := await file.read(1 << 20):
+                    await out.write(chunk)
+                    chunks.append(chunk)
+            await asyncio.to_thread(rag_chatbot.ingest_bytes, str(file_path), b"".join(chunks))
             uploaded_files.append(str(file_path))
         
-        # Sync the entire folder after upload
-        chunk_count = rag_chatbot.sync_folder(str(UPLOAD_DIR))
+        chunk_count = rag_chatbot.get_document_count()
         
         return {
             "status": "success",
@@ -135,17 +172,17 @@ async def upload_documents(files: List[UploadFile] = File(...)):
 async def chat(request: ChatRequest):
     """Chat with the RAG system"""
     try:
-        # Get response
-        # Note: Chat history is handled by the rag_chatbot.chat method
-        response = rag_chatbot.chat(request.question, request.chat_history)
+        # Get response without blocking the event loop
+        # Note: Chat history is handled by the rag_chatbot.achat method
+        query_vector = await question_embedding(request.question)
+        response = await rag_chatbot.achat(request.question, request.chat_history, query_vector)
         
-        # Extract sources
-        sources = []
-        for doc in response.get("context", []):
-            if hasattr(doc, 'metadata') and 'source' in doc.metadata:
-                source = os.path.basename(doc.metadata['source'])
-                if source not in sources:
-                    sources.append(source)
+        # Extract sources (dict.fromkeys dedupes in O(n) and keeps first-seen order)
+        sources = list(dict.fromkeys(
+            os.path.basename(doc.metadata['source'])
+            for doc in response.get("context", [])
+            if hasattr(doc, 'metadata') and 'source' in doc.metadata
+        ))
         
         return ChatResponse(
             answer=response["answer"],
@@ -157,19 +194,31 @@ async def chat(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the answer as NDJSON: one {"delta": ...} line per token, or a final {"error": ...} line"""
+    async def ndjson_stream():
+        try:
+            query_vector = await question_embedding(request.question)
+            async for token in rag_chatbot.astream_chat(request.question, request.chat_history, query_vector):
+                yield json.dumps({"delta": token}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 @app.get("/documents")
 async def list_documents():
     """List uploaded documents"""
     files = []
-    # Use rglob to find files in subdirectories recursively
-    for file_path in UPLOAD_DIR.rglob("*"):
-        if file_path.is_file() and (file_path.suffix == ".pdf" or file_path.suffix == ".docx"):
-            files.append({
-                "name": file_path.name,
-                "rel_path": str(file_path.relative_to(UPLOAD_DIR)),
-                "size": file_path.stat().st_size,
-                "path": str(file_path)
-            })
+    # Same recursive scandir walk the sync uses
+    for entry in iter_documents(str(UPLOAD_DIR)):
+        files.append({
+            "name": entry.name,
+            "rel_path": os.path.relpath(entry.path, UPLOAD_DIR),
+            "size": entry.stat().st_size,
+            "path": entry.path
+        })
     return {"documents": files, "count": len(files)}
 
 @app.delete("/documents/{filename}")
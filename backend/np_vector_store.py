@@ -0,0 +1,198 @@
+"""
+NumPy vector store - exact dot-product search over an in-memory matrix, for small corpora
+"""
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+class NPCollection:
+    """The subset of the Chroma collection API the chatbot uses, over a (N, dim) float32 matrix.
+
+    Vectors are stored as float16 on disk and searched as float32 in memory (a few thousand
+    MiniLM chunks is a few MB, small enough that a full matrix-vector product beats HNSW).
+    """
+    def __init__(self, persist_directory: Optional[str] = None):
+        """Load the index from persist_directory when one was saved there"""
+        self.persist_directory = persist_directory
+        self.metadata: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        if persist_directory:
+            self._load()
+
+    def _paths(self):
+        """Vector matrix and (ids, documents, metadatas) file locations"""
+        return (
+            os.path.join(self.persist_directory, "vectors.npy"),
+            os.path.join(self.persist_directory, "documents.json")
+        )
+
+    def _load(self):
+        """Read a previously persisted index, if any"""
+        vectors_path, docs_path = self._paths()
+        try:
+            with open(docs_path, encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(vectors_path).astype(np.float32)
+        except (OSError, ValueError):
+            return
+        self._ids, self._documents, self._metadatas = data["ids"], data["documents"], data["metadatas"]
+        self._vectors = vectors
+
+    def persist(self):
+        """Write the index to persist_directory (vectors as float16)"""
+        if not self.persist_directory:
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+        vectors_path, docs_path = self._paths()
+        with self._lock:
+            vectors = self._vectors.astype(np.float16)
+            data = {"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas}
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, vectors)
+        with open(docs_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(docs_path + ".tmp", docs_path)
+
+    @staticmethod
+    def _matches(metadata: dict, where: Optional[dict]) -> bool:
+        """Equality-only metadata filter ({"key": value, ...})"""
+        return not where or all(metadata.get(key) == value for key, value in where.items())
+
+    def count(self) -> int:
+        """Number of stored chunks"""
+        return len(self._ids)
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+        """Append chunks and their embeddings"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self._vectors.size:
+                vectors = np.vstack([self._vectors, vectors])
+            self._vectors = vectors
+            self._ids = self._ids + list(ids)
+            self._documents = self._documents + list(documents)
+            self._metadatas = self._metadatas + [dict(m or {}) for m in metadatas]
+
+    def get(self, where: Optional[dict] = None, limit: Optional[int] = None, include: Iterable[str] = ()) -> dict:
+        """Chunks matching where (all when None), with the requested fields"""
+        with self._lock:
+            rows = [i for i, metadata in enumerate(self._metadatas) if self._matches(metadata, where)]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {"ids": [self._ids[i] for i in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[i] for i in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[i] for i in rows]
+            if "embeddings" in include:
+                result["embeddings"] = self._vectors[rows] if rows else np.empty((0, 0), dtype=np.float32)
+        return result
+
+    def delete(self, where: Optional[dict] = None):
+        """Remove chunks matching where"""
+        with self._lock:
+            keep = [i for i, metadata in enumerate(self._metadatas) if not self._matches(metadata, where)]
+            if len(keep) == len(self._ids):
+                return
+            self._vectors = self._vectors[keep] if keep else np.empty((0, 0), dtype=np.float32)
+            self._ids = [self._ids[i] for i in keep]
+            self._documents = [self._documents[i] for i in keep]
+            self._metadatas = [self._metadatas[i] for i in keep]
+
+    def query(self, query_embeddings, n_results: int, include: Iterable[str] = ("documents", "metadatas")) -> dict:
+        """Top n_results chunks per query by inner product (cosine for normalized vectors)"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            vectors, documents, metadatas, ids = self._vectors, self._documents, self._metadatas, self._ids
+        result = {"ids": [], "documents": [], "metadatas": []}
+        if not ids:
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+
+        scores = queries @ vectors.T
+        k = min(n_results, len(ids))
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+            order = top[np.argsort(-row[top], kind="stable")]
+            result["ids"].append([ids[i] for i in order])
+            result["documents"].append([documents[i] for i in order])
+            result["metadatas"].append([metadatas[i] for i in order])
+        return result
+
+    def clear(self):
+        """Drop every chunk and any persisted files"""
+        with self._lock:
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._vectors = np.empty((0, 0), dtype=np.float32)
+        if self.persist_directory:
+            shutil.rmtree(self.persist_directory, ignore_errors=True)
+
+
+class NPVectorStore(VectorStore):
+    """LangChain vector store over an NPCollection (exposed as _collection, like Chroma's)"""
+    def __init__(self, embedding_function: Embeddings, persist_directory: Optional[str] = None):
+        """persist_directory holds vectors.npy/documents.json; None keeps the index in memory only"""
+        self._embedding_function = embedding_function
+        self._collection = NPCollection(persist_directory)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used for text queries"""
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs) -> List[str]:
+        """Embed and add texts"""
+        import uuid
+
+        texts = list(texts)
+        ids = kwargs.get("ids") or [str(uuid.uuid4()) for _ in texts]
+        self._collection.add(
+            ids=ids,
+            embeddings=self._embedding_function.embed_documents(texts),
+            documents=texts,
+            metadatas=metadatas or [{} for _ in texts]
+        )
+        return ids
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        """k nearest chunks to an embedding"""
+        result = self._collection.query(query_embeddings=[embedding], n_results=k)
+        return [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(result["documents"][0], result["metadatas"][0])
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        """k nearest chunks to a text query"""
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k)
+
+    def persist(self):
+        """Save the index to disk (no-op in memory mode)"""
+        self._collection.persist()
+
+    def delete_collection(self):
+        """Remove every chunk, on disk too"""
+        self._collection.clear()
+
+    @classmethod
+    def from_texts(
+        cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs
+    ) -> "NPVectorStore":
+        """Build a store from texts"""
+        store = cls(embedding, kwargs.get("persist_directory"))
+        store.add_texts(texts, metadatas)
+        return store
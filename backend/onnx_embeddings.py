@@ -0,0 +1,89 @@
+"""
+ONNX Runtime embeddings - int8-quantized sentence-transformers models for fast CPU inference
+"""
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class OnnxEmbeddings(Embeddings):
+    """Drop-in replacement for HuggingFaceEmbeddings backed by a dynamically quantized ONNX model"""
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        cache_dir: str = None,
+        batch_size: int = 64,
+        max_length: int = 256,
+        num_threads: int = None
+    ):
+        """Export the model to ONNX and quantize it to int8 on first use, then load it"""
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), ".onnx_models", model_name.replace("/", "__")
+        )
+
+        quantized_file = "model_quantized.onnx"
+        if not os.path.exists(os.path.join(self.cache_dir, quantized_file)):
+            print(f"Exporting {model_name} to ONNX and quantizing to int8 (one-time)...")
+            model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name, export=True, provider="CPUExecutionProvider"
+            )
+            model.save_pretrained(self.cache_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(self.cache_dir)
+
+            # Dynamic int8 quantization (VNNI int8 dot products where the CPU supports them)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=self.cache_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+
+        # Single-threaded sessions by default: concurrent requests each get a core instead of
+        # every call fanning out over all cores and contending (override with RAG_ONNX_THREADS)
+        num_threads = num_threads or int(os.getenv("RAG_ONNX_THREADS", "1"))
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        session_options.inter_op_num_threads = 1
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.cache_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            self.cache_dir,
+            file_name=quantized_file,
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+        print(f"ONNX int8 embeddings ready from {self.cache_dir}")
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """Mean-pooled, L2-normalized sentence embeddings (same output as sentence-transformers)"""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents"""
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._encode([text])[0]
@@ -1,17 +1,350 @@
 """
 Core RAG functionality - handles document processing, embeddings, and retrieval
 """
+from __future__ import annotations
+
+import asyncio
+import bisect
+import concurrent.futures
+import functools
+import hashlib
+import heapq
+import io
+import json
+import multiprocessing
 import os
+import re
 import shutil
-from typing import List
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import sys
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from xml.etree import ElementTree
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
+
+# Heavy integrations (Groq, HuggingFace/torch, Chroma, PDF loaders, transformers) are imported where
+# they are first used, so importing this module (e.g. from the Streamlit app) stays fast
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+# MuPDF and PDFium are not thread-safe (and hold the GIL while parsing), so only one thread
+# may use each at a time
+_FITZ_LOCK = threading.Lock()
+_PDFIUM_LOCK = threading.Lock()
+
+def _reset_pdf_locks():
+    """A forked parse worker must not inherit the locks in a held state"""
+    global _FITZ_LOCK, _PDFIUM_LOCK
+    _FITZ_LOCK = threading.Lock()
+    _PDFIUM_LOCK = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pdf_locks)
+
+try:
+    from .embed_cache import EmbedCache
+    from .np_vector_store import NPVectorStore
+    from .onnx_embeddings import OnnxEmbeddings
+except ImportError:
+    from embed_cache import EmbedCache
+    from np_vector_store import NPVectorStore
+    from onnx_embeddings import OnnxEmbeddings
+
+# Bump when the chunk text/metadata produced by ingestion changes, to invalidate cached ingests
+INGEST_CACHE_VERSION = 4
+
+# Question embeddings kept in each chatbot's LRU (questions longer than 512 chars are not cached)
+QUERY_EMBED_CACHE_SIZE = 1024
+QUERY_EMBED_CACHE_MAX_CHARS = 512
+
+# Max chunks per Chroma add() call
+CHROMA_ADD_BATCH_SIZE = 250
+
+# Fewest files worth forking parse workers for (smaller batches parse in-process)
+PARSE_PROCESS_MIN_FILES = 4
+
+# Per-file (mtime, size, sha256) from the last sync, so unchanged files are not re-hashed
+SYNC_MANIFEST_FILE = "manifest.json"
+
+# System prompt, with runs of whitespace collapsed once at import: every byte is re-sent to Groq
+# on each request, so the layout of the source literal should not cost upload time or tokens
+SYSTEM_PROMPT = re.sub(r"\s+", " ", (
+    "You are a warm internal IT support assistant. "
+    "\n\nAMBIGUITY RULE: "
+    "- If query is 'setup device' without 'Laptop' or 'Mobile', ask: 'Are you setting up your Enbridge Laptop or your Mobile device?' "
+    "\n\nGROUNDING & 'HYPER-DETAIL' RULES: "
+    "- **NEVER SUMMARIZE**: You must reproduce the steps EXACTLY. If the manual has i, ii, iii or a, b, c, you MUST include every one of them in a nested list. "
+    "- **LAPTOP MASTER SEQUENCE**: "
+    "  1. Power & Connect (Plug in, login). "
+    "  2. VPN (Global Protect & Secure Connect). "
+    "  3. Pinning Apps (Outlook/OneDrive/Teams). "
+    "  4. **Rule Import (Page 6/7)**: Include ALL sub-steps (Navigate to ELink, Download rule file, Right-click Inbox -> New Folder 'Inbox External', Manage Rules -> Options -> Import). Then include **Step 5: Verify Folder** (Choose 'Inbox' then 'Inbox External', click OK) and **Step 6: Finalize Rule** (Select 'Apply' then 'OK'). "
+    "  5. DE VDI/VDI (VMware Horizon). "
+    "  6. Printer (Windows+R, \\\\enbpazcwldd001). "
+    "  7. Gnetwork. 8. Software Center. "
+    "- **MOBILE MASTER SEQUENCE**: "
+    "  1. Power & Language/Country. 2. 'Set Up Without Another Device'. 3. Wi-Fi. 4. 'Don't Transfer Apps'. 5. Sign in with Enbridge ID. 6. Okta Authenticate. 7. Company Portal Setup. "
+    "- **AUTHORITATIVE TONE**: Never say 'According to the manual' or 'As stated in the documents'. Answer as an expert who simply knows this information. Never mention 'provided context' or 'snippets'. "
+    "- **UNIVERSAL INQUIRY RULE**: Use your knowledge base for ANY inquiry (backups, resets, apps, etc.) and answer directly without referencing sources. "
+    "- **SMART FALLBACK**: If information is MISSING, provide general IT guidance naturally without prefixing it as 'general guidance'—just help the user directly with best practices. "
+    "\n\nVDI NOTE: Skip 'Citrix' for laptops; focus on 'VMware Horizon'. "
+    "\n\nSTYLE: Simple English, friendly, authoritative. Do not summarize procedures."
+)).strip()
+
+# Max characters of one snippet in the LLM context (keeps 18 snippets within ~4k tokens)
+SNIPPET_MAX_CHARS = 1200
+
+# Semantic answer cache: reuse an answer when a new question's embedding is this close (cosine)
+ANSWER_CACHE_MIN_SIMILARITY = 0.97
+ANSWER_CACHE_SIZE = 256
+
+# Snippets kept after reranking (the context sent to the LLM)
+RERANK_TOP_N = 18
+
+# Question categories for the rerank boosts, found in one regex pass over the lowercased question.
+# Plain substrings (no word boundaries, so "laptops" still counts); the lookahead lets matches overlap
+QUESTION_CATEGORIES = re.compile(
+    r"(?=(?P<setup>setup)|(?P<laptop>laptop)|(?P<mobile>mobile|iphone)|(?P<backup>backup)|(?P<reset>reset))"
+)
+
+# Rerank boosts: (question category, filename keywords, filename exclusions, score).
+# A rule fires when the question has its category and the filename contains one of its
+# keywords but none of its exclusions (the exclusions encode the old if/elif precedence).
+_LAPTOP_SOURCES = ("toolkit", "productivity", "cutover")
+_MOBILE_SOURCES = ("mobile", "set-up", "job aid")
+BOOST_RULES = [
+    ("setup", ("set-up",), (), 10),
+    # LAPTOP TOOLKIT SUPER-BOOST: toolkit pages rank first, mobile guides are deprioritized
+    ("laptop", _LAPTOP_SOURCES, (), 100),
+    ("laptop", _MOBILE_SOURCES, _LAPTOP_SOURCES, -50),
+    ("mobile", _MOBILE_SOURCES, (), 60),
+    ("mobile", ("toolkit", "laptop"), _MOBILE_SOURCES, -50),
+    ("backup", ("backup",), (), 20),
+    ("reset", ("reset",), (), 20),
+]
+
+# HNSW index settings, applied when the collection is first created. Embeddings are
+# L2-normalized, so inner product ranks exactly like cosine without the per-hop norms.
+# rag:space mirrors hnsw:space, which Chroma's modify() drops from the stored metadata
+HNSW_METADATA = {
+    "hnsw:space": "ip",
+    "rag:space": "ip",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 128
+}
+
+DOCUMENT_SUFFIXES = (".pdf", ".docx")
+
+def iter_documents(folder_path: str) -> Iterator[os.DirEntry]:
+    """Recursively yield PDF/DOCX entries under a folder (scandir entries carry cached type info)"""
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_documents(entry.path)
+            elif entry.name.lower().endswith(DOCUMENT_SUFFIXES) and entry.is_file():
+                yield entry
+
+@functools.lru_cache(maxsize=None)
+def _pdf_backend() -> Optional[str]:
+    """Native PDF library to use ("fitz", "pdfium", or None for pypdf), imported on the first PDF"""
+    try:
+        import fitz  # PyMuPDF: C-backed PDF parsing, much faster than pypdf
+        return "fitz"
+    except ImportError:
+        pass
+    try:
+        import pypdfium2  # PDFium bindings: native fallback when PyMuPDF is not installed
+        return "pdfium"
+    except ImportError:
+        return None
+
+def _fitz_documents(source: str, data: Optional[bytes] = None) -> List[Document]:
+    """One Document per page, extracted from a single PyMuPDF handle (file path or in-memory bytes)"""
+    import fitz
+    with _FITZ_LOCK:
+        with (fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(source)) as pdf:
+            return [
+                Document(page_content=page.get_text("text"), metadata={"source": source, "page": i})
+                for i, page in enumerate(pdf)
+            ]
+
+def _pdfium_documents(source: str, data: Optional[bytes] = None) -> List[Document]:
+    """One Document per page, extracted with PDFium (file path or in-memory bytes)"""
+    import pypdfium2
+    with _PDFIUM_LOCK:
+        pdf = pypdfium2.PdfDocument(data if data is not None else source)
+        try:
+            return [
+                Document(page_content=page.get_textpage().get_text_range(), metadata={"source": source, "page": i})
+                for i, page in enumerate(pdf)
+            ]
+        finally:
+            pdf.close()
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_PARAGRAPHS_PER_PAGE = 20  # DOCX has no stored page breaks; group paragraphs into pseudo-pages
+
+def _stream_docx(source: str, data: Optional[bytes] = None) -> Iterator[Document]:
+    """Yield one Document per non-empty paragraph of a DOCX body, parsed incrementally from the zip"""
+    with zipfile.ZipFile(io.BytesIO(data) if data is not None else source) as docx:
+        with docx.open("word/document.xml") as xml:
+            para_idx = 0
+            for _, elem in ElementTree.iterparse(xml, events=("end",)):
+                if elem.tag != f"{_W_NS}p":
+                    continue
+                parts = []
+                for node in elem.iter():
+                    if node.tag == f"{_W_NS}t":
+                        parts.append(node.text or "")
+                    elif node.tag == f"{_W_NS}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{_W_NS}br", f"{_W_NS}cr"):
+                        parts.append("\n")
+                # Clearing frees the subtree (and keeps text-box paragraphs from repeating in their parent)
+                elem.clear()
+                text = "".join(parts).strip()
+                if text:
+                    yield Document(
+                        page_content=text,
+                        metadata={"source": source, "page": para_idx // DOCX_PARAGRAPHS_PER_PAGE}
+                    )
+                    para_idx += 1
+
+def _load_file(file_path: str, data: Optional[bytes] = None) -> List[Document]:
+    """Load a PDF or DOCX file from disk, or from its in-memory bytes when data is given"""
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix == '.pdf':
+        backend = _pdf_backend()
+        if backend == "fitz":
+            return _fitz_documents(file_path, data)
+        if backend == "pdfium":
+            return _pdfium_documents(file_path, data)
+        if data is None:
+            from langchain_community.document_loaders import PyPDFLoader
+            return PyPDFLoader(file_path).load()
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        return [
+            Document(page_content=page.extract_text() or "", metadata={"source": file_path, "page": i})
+            for i, page in enumerate(reader.pages)
+        ]
+    elif suffix == '.docx':
+        return list(_stream_docx(file_path, data))
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+
+@functools.lru_cache(maxsize=None)
+def _get_tokenizer(tokenizer_name: str):
+    """Fast (Rust) tokenizer of the embedding model, loaded once per process"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(tokenizer_name)
+
+def split_documents(
+    docs: List[Document], tokenizer_name: str, chunk_size: int, chunk_overlap: int
+) -> List[Document]:
+    """Token-window chunks of chunk_size tokens overlapping by chunk_overlap, in one tokenizer pass.
+
+    Pages are joined and tokenized with overflowing windows; each chunk is sliced out of the
+    original text through the token offsets (so casing/whitespace survive) and keeps the
+    metadata of the page it starts on.
+    """
+    page_starts, parts, offset = [], [], 0
+    for doc in docs:
+        page_starts.append(offset)
+        parts.append(doc.page_content)
+        offset += len(doc.page_content) + 2
+    full_text = "\n\n".join(parts)
+    
+    encoding = _get_tokenizer(tokenizer_name)(
+        full_text,
+        add_special_tokens=False,
+        max_length=chunk_size,
+        stride=chunk_overlap,
+        truncation=True,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True
+    )
+    
+    chunks = []
+    for offsets in encoding["offset_mapping"]:
+        if not offsets:
+            continue
+        start, end = offsets[0][0], offsets[-1][1]
+        page_doc = docs[bisect.bisect_right(page_starts, start) - 1]
+        chunks.append(Document(page_content=full_text[start:end], metadata=dict(page_doc.metadata)))
+    return chunks
+
+def _load_and_split(
+    file_path: str, tokenizer_name: str, chunk_size: int, chunk_overlap: int, data: Optional[bytes] = None
+) -> Tuple[str, List[Document]]:
+    """Load and split one file; module-level (and state-free) so it can run in a worker process"""
+    print(f"Loading: {os.path.basename(file_path)}")
+    docs = _load_file(file_path, data)
+    doc_title = os.path.basename(file_path).replace(".pdf", "").replace("Job Aid_", "")
+    if not docs:
+        print(f"⚠️  File {os.path.basename(file_path)} returned no content.")
+        return doc_title, []
+    return doc_title, split_documents(docs, tokenizer_name, chunk_size, chunk_overlap)
+
+@functools.lru_cache(maxsize=None)
+def _get_embeddings(embedding_model: str, backend: str, device: str) -> Embeddings:
+    """Embedding model shared by every RAGChatbot in the process, so it is only loaded once"""
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name=embedding_model)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=embedding_model,
+        model_kwargs={"device": device},
+        encode_kwargs={"normalize_embeddings": True, "batch_size": 64}
+    )
+
+@functools.lru_cache(maxsize=None)
+def _get_embed_cache(path: str, model_name: str) -> Optional[EmbedCache]:
+    """Chunk embedding cache shared by every RAGChatbot in the process; None when LMDB is unavailable"""
+    try:
+        import lmdb
+    except ImportError:
+        return None
+    try:
+        return EmbedCache(path, model_name)
+    except lmdb.Error as e:
+        print(f"⚠️  Embedding cache disabled ({e})")
+        return None
+
+@functools.lru_cache(maxsize=4096)
+def _source_boosts(source_name: str) -> Tuple[Tuple[str, int], ...]:
+    """(category, score) of every boost rule a lowercased filename satisfies, computed once per file"""
+    return tuple(
+        (category, weight)
+        for category, src_kws, exclude_kws, weight in BOOST_RULES
+        if any(kw in source_name for kw in src_kws) and not any(kw in source_name for kw in exclude_kws)
+    )
+
+def _parse_executor(num_files: int) -> concurrent.futures.Executor:
+    """Worker processes for parsing (pure-Python PDF parsing is GIL-bound), or in-process threads.
+
+    Processes are forked so workers inherit the loaded tokenizer and never re-import the app's
+    __main__ (spawn/forkserver would re-run backend/main.py's startup in every worker). Forking is
+    only safe while no other thread can hold a lock, so a threaded server (uvicorn's executor
+    threads, Streamlit's script threads) and small batches parse in-process instead.
+    """
+    max_workers = max(1, min(num_files, (os.cpu_count() or 2) - 1))
+    if (
+        sys.platform.startswith("linux")
+        and num_files >= PARSE_PROCESS_MIN_FILES
+        and threading.active_count() == 1
+    ):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+        )
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
 
 class RAGChatbot:
     """Production-ready RAG Chatbot"""
@@ -40,6 +373,7 @@ class RAGChatbot:
         os.environ["GROQ_API_KEY"] = groq_api_key
         
         # Initialize LLM
+        from langchain_groq import ChatGroq
         self.llm = ChatGroq(
             model=model_name,
             temperature=0,
@@ -47,58 +381,144 @@ class RAGChatbot:
             max_retries=3
         )
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model
-        )
+        # Initialize embeddings: int8 ONNX on CPU when RAG_EMBED_BACKEND=onnx, otherwise
+        # sentence-transformers on GPU/MPS when available (override with RAG_EMBED_DEVICE)
+        # (embedding_backend records which one actually loaded: their vectors are not interchangeable)
+        self.embeddings = None
+        if os.getenv("RAG_EMBED_BACKEND", "huggingface").lower() == "onnx":
+            try:
+                self.embeddings = _get_embeddings(embedding_model, "onnx", "cpu")
+                self.embedding_backend = "onnx"
+            except ImportError as e:
+                print(f"⚠️  ONNX embeddings unavailable ({e}), falling back to HuggingFace")
+        if self.embeddings is None:
+            embed_device = os.getenv("RAG_EMBED_DEVICE") or self._detect_device()
+            print(f"Embedding device: {embed_device}")
+            self.embeddings = _get_embeddings(embedding_model, "huggingface", embed_device)
+            self.embedding_backend = "huggingface"
         
-        # Initialize text splitter (Title-aware chunks)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=400,
-            length_function=len
+        # Chunking settings, in model tokens so each chunk fits MiniLM's 256-token window
+        # instead of being silently truncated
+        self.embedding_model = embedding_model
+        self.chunk_size = 240
+        self.chunk_overlap = 40
+        
+        # On-disk cache of (chunks, embeddings) per ingested file, so restarts skip the pipeline
+        self.cache_dir = os.path.join(self.backend_dir, ".ingest_cache")
+        
+        # Per-chunk embedding cache, so an edited file only re-embeds the chunks that changed
+        self.embed_cache = _get_embed_cache(
+            os.path.join(self.backend_dir, ".embed_cache"), f"{self.embedding_backend}:{embedding_model}"
         )
         
-        # Vector store settings
+        # Vector store settings: Chroma (HNSW) by default, or an exact NumPy dot-product index
+        # with RAG_VECTOR_BACKEND=numpy (faster for a corpus of a few thousand chunks)
+        self.vector_backend = os.getenv("RAG_VECTOR_BACKEND", "chroma").lower()
         self.collection_name = collection_name
         self.vectorstore = None
         self.retriever = None
-        self.rag_chain = None
+        self.search_k = 40  # High-depth candidate pool for reranking
+        
+        # Per-instance LRU of question embeddings (normalized question -> vector) so repeated
+        # questions skip the encoder; the API fills it from its micro-batcher too
+        self._query_vectors: OrderedDict[str, tuple] = OrderedDict()
+        self._query_vectors_lock = threading.Lock()
+        
+        # Semantic answer cache: (unit query vector, answer, snippets) for recent questions, so
+        # near-duplicate questions skip retrieval and the LLM call. Cleared whenever the index changes
+        self._answer_cache_vecs = np.empty((0, 0), dtype=np.float32)
+        self._answer_cache_results: List[dict] = []
+        self._answer_cache_lock = threading.Lock()
+        
+        # Build the prompt | LLM | parser chain once; syncs only swap the retriever
+        self._setup_rag_chain()
         
         # Load existing vector store if it exists
         self._load_vectorstore()
     
+    @staticmethod
+    def _detect_device() -> str:
+        """Pick the fastest torch device available for the embedding model"""
+        try:
+            import torch
+            if torch.cuda.is_available():
+                return "cuda"
+            if torch.backends.mps.is_available():
+                return "mps"
+        except Exception:
+            pass
+        return "cpu"
+    
+    def _create_vectorstore(self) -> Chroma | NPVectorStore:
+        """Create (or open) the Chroma collection, persistent when a directory is configured"""
+        if self.vector_backend == "numpy":
+            return NPVectorStore(
+                self.embeddings,
+                os.path.join(self.chroma_persist_dir, "numpy_index") if self.chroma_persist_dir else None
+            )
+        
+        from langchain_chroma import Chroma
+        kwargs = {
+            "collection_name": self.collection_name,
+            "embedding_function": self.embeddings,
+            "collection_metadata": HNSW_METADATA
+        }
+        # Only add persist_directory if we have a path
+        if self.chroma_persist_dir:
+            kwargs["persist_directory"] = self.chroma_persist_dir
+        vectorstore = Chroma(**kwargs)
+        
+        # The distance function is fixed at creation: rebuild collections made with another one
+        # (sync_folder then re-indexes every file, from the ingest cache where possible)
+        metadata = vectorstore._collection.metadata or {}
+        space = metadata.get("hnsw:space") or metadata.get("rag:space", "l2")
+        if space != HNSW_METADATA["hnsw:space"]:
+            print(f"♻️  Rebuilding {self.collection_name}: distance {space} -> {HNSW_METADATA['hnsw:space']}")
+            vectorstore.delete_collection()
+            vectorstore = Chroma(**kwargs)
+        
+        # Collections created before a tuning change keep their old search_ef; bring it up to date
+        metadata = vectorstore._collection.metadata or {}
+        if metadata.get("hnsw:search_ef") != HNSW_METADATA["hnsw:search_ef"]:
+            try:
+                vectorstore._collection.modify(metadata={
+                    **{k: v for k, v in metadata.items() if k != "hnsw:space"},
+                    "rag:space": HNSW_METADATA["hnsw:space"],
+                    "hnsw:search_ef": HNSW_METADATA["hnsw:search_ef"]
+                })
+            except Exception as e:
+                print(f"⚠️  Could not update search_ef on {self.collection_name}: {e}")
+        return vectorstore
+    
     def _load_vectorstore(self):
         """Load existing vector store or create new one"""
         try:
             if os.path.exists(self.chroma_persist_dir):
-                self.vectorstore = Chroma(
-                    collection_name=self.collection_name,
-                    embedding_function=self.embeddings,
-                    persist_directory=self.chroma_persist_dir
-                )
+                self.vectorstore = self._create_vectorstore()
                 self.retriever = self.vectorstore.as_retriever(
                     search_type="similarity",
                     search_kwargs={"k": 5}
                 )
-                self._setup_rag_chain()
                 print(f"Loaded existing vector store from {self.chroma_persist_dir}")
         except Exception as e:
             print(f"⚠️  Could not load existing vector store: {e}")
     
+    def _persist_index(self):
+        """Save the NumPy index to disk after a change (Chroma persists its own writes)"""
+        if isinstance(self.vectorstore, NPVectorStore):
+            self.vectorstore.persist()
+    
     def load_documents(self, file_path: str) -> List[Document]:
         """Load documents from PDF or DOCX file"""
-        if file_path.endswith('.pdf'):
-            loader = PyPDFLoader(file_path)
-        elif file_path.endswith('.docx'):
-            loader = Docx2txtLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_path}")
-        
-        return loader.load()
+        return _load_file(file_path)
     
-    def sync_folder(self, folder_path: str) -> int:
-        """Scan a folder recursively and process any PDF or DOCX files found"""
+    def sync_folder(
+        self, folder_path: str, batch_size: int = CHROMA_ADD_BATCH_SIZE, embed_batch_size: Optional[int] = None
+    ) -> int:
+        """Scan a folder recursively and process any PDF or DOCX files found.
+
+        batch_size bounds each collection add; embed_batch_size (None = all at once) bounds each embedding call.
+        """
         # Convert to absolute path if necessary
         if not os.path.isabs(folder_path):
             folder_path = os.path.abspath(folder_path)
@@ -108,164 +528,446 @@ class RAGChatbot:
         if not os.path.exists(folder_path):
             os.makedirs(folder_path, exist_ok=True)
             print(f"Created folder: {folder_path}")
-            return 0
         
         # Get all PDF and DOCX files recursively
-        file_paths = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.pdf') or file.endswith('.docx'):
-                    full_path = os.path.join(root, file)
-                    file_paths.append(full_path)
-                    print(f"Found document: {full_path}")
-        
-        if not file_paths:
+        entries = list(iter_documents(folder_path))
+        file_paths = [entry.path for entry in entries]
+        
+        # An empty folder still goes through the stale-file cleanup below, so deleting the last
+        # document also removes its chunks from the index
+        if file_paths:
+            print(f"📊 Total documents found for indexing: {len(file_paths)}")
+        else:
             print(f"⚠️  No documents found in {folder_path}")
-            return 0
         
-        print(f"📊 Total documents found for indexing: {len(file_paths)}")
+        # Incremental sync: only re-embed files whose content (or ingest settings) changed.
+        # Files whose (mtime, size) match the manifest reuse their recorded hash instead of being re-read
+        manifest = self._read_manifest()
+        new_manifest = {}
+        file_hashes = {}
+        for entry in entries:
+            stat = entry.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            previous = manifest.get(entry.path)
+            if previous and previous[:2] == signature:
+                file_hashes[entry.path] = previous[2]
+            else:
+                file_hashes[entry.path] = self._file_hash(entry.path)
+            new_manifest[entry.path] = signature + [file_hashes[entry.path]]
+        if self.vectorstore is None:
+            self.vectorstore = self._create_vectorstore()
+        indexed_keys = self._indexed_ingest_keys()
         
-        # Clear existing vector store for a fresh sync to avoid duplicates
-        self.clear_vectorstore()
+        # Drop chunks of files that were removed from the folder or changed on disk
+        stale_sources = set(indexed_keys) - set(file_hashes)
+        changed_paths = [
+            path for path, h in file_hashes.items()
+            if indexed_keys.get(path) != self._ingest_key(path, h)
+        ]
+        stale_sources.update(path for path in changed_paths if path in indexed_keys)
+        for source in stale_sources:
+            self.vectorstore._collection.delete(where={"source": source})
+            self._drop_ingest_cache(indexed_keys[source])
+        if stale_sources:
+            self._clear_answer_cache()
         
-        return self.process_documents(file_paths)
+        if changed_paths:
+            print(f"♻️  {len(changed_paths)} new/changed documents, {len(file_paths) - len(changed_paths)} unchanged")
+            self.process_documents(changed_paths, file_hashes, batch_size, embed_batch_size)
+        else:
+            if file_paths:
+                print("✅ All documents are up to date, nothing to re-index")
+            if self.retriever is None:
+                self.retriever = self.vectorstore.as_retriever(
+                    search_type="similarity",
+                    search_kwargs={"k": self.search_k}
+                )
+        if changed_paths or stale_sources:
+            self._persist_index()
+        self._write_manifest(new_manifest)
+        
+        return self.get_document_count()
+    
+    def _manifest_path(self) -> Optional[str]:
+        """Sync manifest location (persistent mode only: an in-memory index starts empty anyway)"""
+        if not self.chroma_persist_dir:
+            return None
+        return os.path.join(self.chroma_persist_dir, SYNC_MANIFEST_FILE)
+    
+    def _read_manifest(self) -> Dict[str, list]:
+        """Previous sync's {path: [mtime_ns, size, sha256]}, or {} when missing or stale"""
+        path = self._manifest_path()
+        if path is None:
+            return {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("collection") != self.collection_name:
+            return {}
+        return manifest.get("files", {})
     
-    def process_documents(self, file_paths: List[str]) -> int:
-        """Process and add documents to vector store"""
+    def _write_manifest(self, files: Dict[str, list]):
+        """Record each synced file's (mtime, size) and content hash"""
+        path = self._manifest_path()
+        if path is None or not os.path.isdir(self.chroma_persist_dir):
+            return
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection_name, "files": files}, f)
+        os.replace(path + ".tmp", path)
+    
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        """SHA256 of a file's contents, read in blocks"""
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+    
+    def _ingest_key(self, file_path: str, file_hash: str) -> str:
+        """Key identifying one file's chunks+embeddings: file content plus every setting that shapes them"""
+        parts = [
+            str(INGEST_CACHE_VERSION), file_path, file_hash,
+            self.embedding_backend, self.embedding_model, str(self.chunk_size), str(self.chunk_overlap)
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    
+    def _indexed_ingest_keys(self) -> Dict[str, str]:
+        """Map of source path -> ingest_key for everything currently in the collection"""
+        existing = self.vectorstore._collection.get(include=["metadatas"])
+        return {
+            meta["source"]: meta.get("ingest_key")
+            for meta in existing["metadatas"]
+            if meta and "source" in meta
+        }
+    
+    def _read_ingest_cache(self, ingest_key: str) -> Optional[Tuple[List[Document], np.ndarray]]:
+        """Cached chunks and embeddings for an ingest key, or None on a miss"""
+        path = os.path.join(self.cache_dir, f"{ingest_key}.npz")
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                payload = json.loads(str(data["payload"]))
+                embeddings = data["emb"].astype(np.float32)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable ingest cache {path}: {e}")
+            return None
+        splits = [
+            Document(page_content=text, metadata=meta)
+            for text, meta in zip(payload["texts"], payload["metadatas"])
+        ]
+        return splits, embeddings
+    
+    def _write_ingest_cache(self, ingest_key: str, splits: List[Document], embeddings: np.ndarray):
+        """Store one file's chunks and embeddings (embeddings as float16 to halve disk and load bandwidth)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            payload = json.dumps({
+                "texts": [split.page_content for split in splits],
+                "metadatas": [split.metadata for split in splits]
+            })
+            np.savez_compressed(
+                os.path.join(self.cache_dir, f"{ingest_key}.npz"),
+                emb=np.asarray(embeddings, dtype=np.float16),
+                payload=np.array(payload)
+            )
+        except Exception as e:
+            print(f"⚠️  Could not write ingest cache: {e}")
+    
+    def _drop_ingest_cache(self, ingest_key: Optional[str]):
+        """Delete the cached ingest of a file version that is no longer indexed"""
+        if not ingest_key:
+            return
+        try:
+            os.remove(os.path.join(self.cache_dir, f"{ingest_key}.npz"))
+        except OSError:
+            pass
+    
+    def load_bytes(self, file_path: str, data: bytes) -> List[Document]:
+        """Load documents from the in-memory contents of a PDF or DOCX file"""
+        return _load_file(file_path, data)
+    
+    def ingest_bytes(self, file_path: str, data: bytes) -> int:
+        """Index one uploaded file straight from memory, replacing any older version of it"""
+        file_path = os.path.abspath(file_path)
+        file_hash = hashlib.sha256(data).hexdigest()
+        ingest_key = self._ingest_key(file_path, file_hash)
+        
+        if self.vectorstore is None:
+            self.vectorstore = self._create_vectorstore()
+        existing = self.vectorstore._collection.get(where={"source": file_path}, limit=1, include=["metadatas"])
+        if existing["metadatas"] and existing["metadatas"][0].get("ingest_key") == ingest_key:
+            print(f"✅ {os.path.basename(file_path)} is already indexed")
+            return 0
+        self.vectorstore._collection.delete(where={"source": file_path})
+        if existing["metadatas"]:
+            self._clear_answer_cache()
+            self._drop_ingest_cache(existing["metadatas"][0].get("ingest_key"))
+        
+        cached = self._read_ingest_cache(ingest_key)
+        if cached is None:
+            cached = self._ingest_new_bytes(file_path, data, file_hash, ingest_key)
+        indexed = self._index_splits(*cached)
+        self._persist_index()
+        return indexed
+    
+    def _ingest_new_bytes(
+        self, file_path: str, data: bytes, file_hash: str, ingest_key: str
+    ) -> Tuple[List[Document], np.ndarray]:
+        """Load, split and embed an uploaded file that has no cached ingest"""
+        doc_title, file_splits = _load_and_split(
+            file_path, self.embedding_model, self.chunk_size, self.chunk_overlap, data
+        )
+        self._tag_title(doc_title, file_splits)
+        for split in file_splits:
+            split.metadata["file_hash"] = file_hash
+            split.metadata["ingest_key"] = ingest_key
+        embeddings = self._encode_sorted([split.page_content for split in file_splits])
+        if file_splits:
+            self._write_ingest_cache(ingest_key, file_splits, embeddings)
+        return file_splits, embeddings
+    
+    @staticmethod
+    def _tag_title(doc_title: str, file_splits: List[Document]):
+        """Record the manual title on every chunk (attached to the text only when building the prompt)"""
+        for split in file_splits:
+            split.metadata["title"] = doc_title
+    
+    def process_documents(
+        self,
+        file_paths: List[str],
+        file_hashes: Optional[Dict[str, str]] = None,
+        batch_size: int = CHROMA_ADD_BATCH_SIZE,
+        embed_batch_size: Optional[int] = None
+    ) -> int:
+        """Process and add documents to vector store (tagging chunks with their file's hash)"""
+        file_hashes = dict(file_hashes or {})
         total_chunks = 0
         all_splits = []
+        all_embeddings = []
         
-        # Load and split each document separately for better tracking
+        # Files with a cached ingest skip loading, splitting and embedding entirely
+        ingest_keys = {}
+        to_parse = []
         for file_path in file_paths:
-            try:
-                print(f"Loading: {os.path.basename(file_path)}")
-                docs = self.load_documents(file_path)
-                if not docs:
-                    print(f"⚠️  File {os.path.basename(file_path)} returned no content.")
+            file_hashes[file_path] = file_hashes.get(file_path) or self._file_hash(file_path)
+            ingest_keys[file_path] = self._ingest_key(file_path, file_hashes[file_path])
+            cached = self._read_ingest_cache(ingest_keys[file_path])
+            if cached is None:
+                to_parse.append(file_path)
+                continue
+            print(f"⚡ Loaded {len(cached[0])} cached chunks for {os.path.basename(file_path)}")
+            all_splits.extend(cached[0])
+            all_embeddings.append(cached[1])
+            total_chunks += len(cached[0])
+        
+        # Load and split files in parallel (PDF/DOCX parsing is independent per file)
+        parsed = {}
+        if to_parse:
+            _get_tokenizer(self.embedding_model)  # load before forking so workers inherit it
+        with _parse_executor(len(to_parse)) as ex:
+            futures = {
+                ex.submit(_load_and_split, p, self.embedding_model, self.chunk_size, self.chunk_overlap): p
+                for p in to_parse
+            }
+            for future in concurrent.futures.as_completed(futures):
+                file_path = futures[future]
+                try:
+                    doc_title, file_splits = future.result()
+                except Exception as e:
+                    print(f"❌ Error processing {os.path.basename(file_path)}: {e}")
                     continue
                 
-                # Split this file's documents
-                file_splits = self.text_splitter.split_documents(docs)
-                
-                # Prepend Title to every chunk for better retrieval hits
-                doc_title = os.path.basename(file_path).replace(".pdf", "").replace("Job Aid_", "")
+                if not file_splits:
+                    continue
+                self._tag_title(doc_title, file_splits)
                 for split in file_splits:
-                    split.page_content = f"[Manual: {doc_title}] Page {split.metadata.get('page', '?')}\n{split.page_content}"
-                
+                    split.metadata["file_hash"] = file_hashes[file_path]
+                    split.metadata["ingest_key"] = ingest_keys[file_path]
                 print(f"Created {len(file_splits)} title-aware chunks from {os.path.basename(file_path)}")
-                all_splits.extend(file_splits)
+                parsed[file_path] = file_splits
                 total_chunks += len(file_splits)
-                
-            except Exception as e:
-                print(f"❌ Error processing {os.path.basename(file_path)}: {e}")
         
+        # Embed every new chunk in one batched pass, then cache each file's slice for next time
+        new_splits = [split for file_splits in parsed.values() for split in file_splits]
+        if new_splits:
+            new_embeddings = self._encode_sorted([split.page_content for split in new_splits], embed_batch_size)
+            offset = 0
+            for file_path, file_splits in parsed.items():
+                self._write_ingest_cache(
+                    ingest_keys[file_path], file_splits, new_embeddings[offset:offset + len(file_splits)]
+                )
+                offset += len(file_splits)
+            all_splits.extend(new_splits)
+            all_embeddings.append(new_embeddings)
+        
+        return self._index_splits(
+            all_splits, np.vstack(all_embeddings) if all_embeddings else None, batch_size, embed_batch_size
+        )
+    
+    def _index_splits(
+        self,
+        all_splits: List[Document],
+        embeddings: Optional[np.ndarray] = None,
+        batch_size: int = CHROMA_ADD_BATCH_SIZE,
+        embed_batch_size: Optional[int] = None
+    ) -> int:
+        """Add chunks (embedding them first unless pre-computed embeddings are given) to the vector store"""
         if not all_splits:
             print("⚠️  No chunks were created from any documents")
             return 0
         
-        # Create or update vector store
+        # Write chunks and their embeddings straight to the collection
         print(f"Indexing {len(all_splits)} total chunks into ChromaDB...")
+        texts = [split.page_content for split in all_splits]
+        metadatas = [split.metadata for split in all_splits]
+        if embeddings is None:
+            embeddings = self._encode_sorted(texts, embed_batch_size)
+        
         if self.vectorstore is None:
-            kwargs = {
-                "collection_name": self.collection_name,
-                "documents": all_splits,
-                "embedding": self.embeddings
-            }
-            # Only add persist_directory if we have a path
-            if self.chroma_persist_dir:
-                kwargs["persist_directory"] = self.chroma_persist_dir
-                
-            self.vectorstore = Chroma.from_documents(**kwargs)
-        else:
-            self.vectorstore.add_documents(all_splits)
+            self.vectorstore = self._create_vectorstore()
+        # Chroma stores float32 internally: hand it the contiguous matrix, not nested Python float lists.
+        # Writes go in bounded slices (Chroma rejects adds above its max batch size)
+        ids = [str(uuid.uuid4()) for _ in texts]
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            self.vectorstore._collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end]
+            )
         
-        # Setup retriever and RAG chain (High-depth for reranking)
+        # Setup retriever (High-depth for reranking)
         self.retriever = self.vectorstore.as_retriever(
             search_type="similarity",
-            search_kwargs={"k": 40}
+            search_kwargs={"k": self.search_k}
         )
-        self._setup_rag_chain()
+        self._clear_answer_cache()
         
         print(f"Vector store updated and ready with {len(all_splits)} chunks")
         return len(all_splits)
     
+    def _encode_sorted(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Embed texts, reusing cached vectors for chunks whose text was embedded before"""
+        encode = functools.partial(self._encode_length_sorted, batch_size=batch_size)
+        if self.embed_cache is not None:
+            return self.embed_cache.get_or_compute(texts, encode)
+        return encode(texts)
+    
+    def _encode_length_sorted(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Embed texts grouped by length (less padding per batch), returned in the original order.
+
+        batch_size caps how many texts go to the model per call (None sends them all at once).
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        step = batch_size or len(sorted_texts) or 1
+        sorted_embeddings = np.asarray([
+            vector
+            for start in range(0, len(sorted_texts), step)
+            for vector in self.embeddings.embed_documents(sorted_texts[start:start + step])
+        ], dtype=np.float32)
+        
+        # Scatter the embeddings back to the caller's order
+        inv = [0] * len(order)
+        for i, j in enumerate(order):
+            inv[j] = i
+        return sorted_embeddings[inv]
+    
     def _setup_rag_chain(self):
         """Setup a simple RAG chain"""
         self.qa_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a warm internal IT support assistant. "
-                       "\n\nAMBIGUITY RULE: "
-                       "- If query is 'setup device' without 'Laptop' or 'Mobile', ask: 'Are you setting up your Enbridge Laptop or your Mobile device?' "
-                       "\n\nGROUNDING & 'HYPER-DETAIL' RULES: "
-                       "- **NEVER SUMMARIZE**: You must reproduce the steps EXACTLY. If the manual has i, ii, iii or a, b, c, you MUST include every one of them in a nested list. "
-                       "- **LAPTOP MASTER SEQUENCE**: "
-                       "  1. Power & Connect (Plug in, login). "
-                       "  2. VPN (Global Protect & Secure Connect). "
-                       "  3. Pinning Apps (Outlook/OneDrive/Teams). "
-                       "  4. **Rule Import (Page 6/7)**: Include ALL sub-steps (Navigate to ELink, Download rule file, Right-click Inbox -> New Folder 'Inbox External', Manage Rules -> Options -> Import). Then include **Step 5: Verify Folder** (Choose 'Inbox' then 'Inbox External', click OK) and **Step 6: Finalize Rule** (Select 'Apply' then 'OK'). "
-                       "  5. DE VDI/VDI (VMware Horizon). "
-                       "  6. Printer (Windows+R, \\\\enbpazcwldd001). "
-                       "  7. Gnetwork. 8. Software Center. "
-                       "- **MOBILE MASTER SEQUENCE**: "
-                       "  1. Power & Language/Country. 2. 'Set Up Without Another Device'. 3. Wi-Fi. 4. 'Don't Transfer Apps'. 5. Sign in with Enbridge ID. 6. Okta Authenticate. 7. Company Portal Setup. "
-                       "- **AUTHORITATIVE TONE**: Never say 'According to the manual' or 'As stated in the documents'. Answer as an expert who simply knows this information. Never mention 'provided context' or 'snippets'. "
-                       "- **UNIVERSAL INQUIRY RULE**: Use your knowledge base for ANY inquiry (backups, resets, apps, etc.) and answer directly without referencing sources. "
-                       "- **SMART FALLBACK**: If information is MISSING, provide general IT guidance naturally without prefixing it as 'general guidance'—just help the user directly with best practices. "
-                       "\n\nVDI NOTE: Skip 'Citrix' for laptops; focus on 'VMware Horizon'. "
-                       "\n\nSTYLE: Simple English, friendly, authoritative. Do not summarize procedures."),
+            ("system", SYSTEM_PROMPT),
             ("system", "Internal Support Knowledge: {context}"),
             ("human", "{question}")
         ])
         # Create a simple chain
-        from langchain_core.output_parsers import StrOutputParser
         self.rag_chain = self.qa_prompt | self.llm | StrOutputParser()
     
-    def chat(self, question: str, chat_history: List = None) -> dict:
-        """Chat with the RAG system"""
-        if self.rag_chain is None:
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Normalized form of a question used for query embeddings"""
+        return question.strip().lower()
+    
+    def cached_query_embedding(self, question: str) -> Optional[List[float]]:
+        """A question's embedding from the LRU cache, or None on a miss"""
+        normalized = self.normalize_question(question)
+        with self._query_vectors_lock:
+            vector = self._query_vectors.get(normalized)
+            if vector is None:
+                return None
+            self._query_vectors.move_to_end(normalized)
+        return list(vector)
+    
+    def remember_query_embedding(self, question: str, vector: List[float]):
+        """Add a question's embedding to the LRU cache, evicting the least recently used"""
+        if len(question) > QUERY_EMBED_CACHE_MAX_CHARS:
+            return
+        normalized = self.normalize_question(question)
+        with self._query_vectors_lock:
+            self._query_vectors[normalized] = tuple(vector)
+            self._query_vectors.move_to_end(normalized)
+            while len(self._query_vectors) > QUERY_EMBED_CACHE_SIZE:
+                self._query_vectors.popitem(last=False)
+    
+    def _query_embedding(self, question: str) -> List[float]:
+        """Embedding for a question, served from the LRU cache for short/repeated questions"""
+        vector = self.cached_query_embedding(question)
+        if vector is None:
+            vector = list(self.embeddings.embed_query(self.normalize_question(question)))
+            self.remember_query_embedding(question, vector)
+        return vector
+    
+    def _query_collection(self, query_vectors: List[List[float]], k: int) -> List[List[Document]]:
+        """Nearest chunks for each query vector, in one call straight to the Chroma collection
+        (skips LangChain's wrapper and distances)"""
+        result = self.vectorstore._collection.query(
+            query_embeddings=[list(query_vector) for query_vector in query_vectors],
+            n_results=k,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(result["documents"], result["metadatas"])
+        ]
+    
+    def retrieve(self, question: str, query_vector: Optional[List[float]] = None) -> List[Document]:
+        """Retrieve and rerank the snippets used to answer a question"""
+        if self.retriever is None:
             raise ValueError("No documents loaded. Please upload documents first.")
         
         # Get relevant documents
         print(f"Searching for: {question}")
-        raw_docs = self.retriever.invoke(question)
-        
+        if query_vector is None:
+            query_vector = self._query_embedding(question)
+        raw_docs = self._query_collection([query_vector], self.search_k)[0]
+        return self._rerank(question, raw_docs)
+    
+    def _rerank(self, question: str, raw_docs: List[Document]) -> List[Document]:
+        """Boost candidates by filename/page, keep the top RERANK_TOP_N and order them by source and page"""
         # DEEP RERANKING: Boost by filename OR sequence (Page 0/1)
-        q_lower = question.lower()
-        scored_docs = []
-        for doc in raw_docs:
-            source = os.path.basename(doc.metadata.get("source", "")).lower()
-            page = doc.metadata.get("page", 0)
-            score = 0
-            
-            # FILENAME & KEYWORD BOOST
-            if "setup" in q_lower and "set-up" in source: score += 10
-            
-            # LAPTOP TOOLKIT SUPER-BOOST: If query is about laptop, give ALL toolkit pages huge priority
-            if "laptop" in q_lower:
-                if "toolkit" in source or "productivity" in source or "cutover" in source:
-                    score += 100 # This ensures toolkit chunks rank first
-                elif "mobile" in source or "set-up" in source or "job aid" in source:
-                    score -= 50  # Deprioritize mobile if laptop is requested
-            
-            if "mobile" in q_lower or "iphone" in q_lower:
-                if "mobile" in source or "set-up" in source or "job aid" in source:
-                    score += 60
-                elif "toolkit" in source or "laptop" in source:
-                    score -= 50 # Deprioritize laptop if mobile is requested
-
-            if "backup" in q_lower and "backup" in source: score += 20
-            if "reset" in q_lower and "reset" in source: score += 20
-            
-            # Sequence Boost: Page 0/1 is the start of the procedure
-            if page <= 1: score += 20
-            elif page <= 3: score += 10
-            
-            scored_docs.append((score, doc))
+        q_categories = {m.lastgroup for m in QUESTION_CATEGORIES.finditer(question.lower())}
+        boosts = np.array([
+            sum(
+                weight
+                for category, weight in _source_boosts(os.path.basename(doc.metadata.get("source", "")).lower())
+                if category in q_categories
+            )
+            for doc in raw_docs
+        ], dtype=np.float32)
+        pages = np.array([doc.metadata.get("page", 0) for doc in raw_docs])
         
-        # Sort by boosted score
-        reranked_docs = [d[1] for d in sorted(scored_docs, key=lambda x: x[0], reverse=True)]
+        # Sequence Boost: Page 0/1 is the start of the procedure
+        scores = boosts + np.where(pages <= 1, 20, np.where(pages <= 3, 10, 0))
         
-        # OPTIMIZED CONTEXT: 18 snippets to cover 16-page manuals while staying under 6000 tokens
-        final_docs = reranked_docs[:18]
+        # OPTIMIZED CONTEXT: top 18 snippets by boosted score to cover 16-page manuals while
+        # staying under 6000 tokens (nlargest is stable, so ties keep their similarity order)
+        top = heapq.nlargest(RERANK_TOP_N, range(len(raw_docs)), key=scores.__getitem__)
+        final_docs = [raw_docs[i] for i in top]
         
         # SORT DOCS: Group by source and sort by page number
         def sort_key(doc):
@@ -276,25 +978,171 @@ class RAGChatbot:
         docs = sorted(final_docs, key=sort_key)
         
         print(f"Found {len(docs)} deep-matched snippets from {len(set(doc.metadata.get('source','') for doc in docs))} different files")
-        
-        # Format context from documents
-        context = ""
-        for i, doc in enumerate(docs):
+        return docs
+    
+    @staticmethod
+    def _format_context(docs: List[Document]) -> str:
+        """Format retrieved snippets into the context block for the prompt"""
+        parts = []
+        for doc in docs:
             source_name = os.path.basename(doc.metadata.get('source', 'Manual'))
             page_num = doc.metadata.get('page', '?')
-            context += f"--- Source: {source_name} (Page {page_num}) ---\n"
-            context += doc.page_content + "\n\n"
+            parts.append(f"--- Source: {source_name} (Page {page_num}) ---\n")
+            if 'title' in doc.metadata:
+                parts.append(f"[Manual: {doc.metadata['title']}] Page {page_num}\n")
+            parts.append(doc.page_content[:SNIPPET_MAX_CHARS])
+            parts.append("\n\n")
+        return "".join(parts)
+    
+    @staticmethod
+    def _unit_vector(query_vector: List[float]) -> np.ndarray:
+        """Query vector as a float32 unit vector (cosine similarity becomes a dot product)"""
+        q = np.asarray(query_vector, dtype=np.float32)
+        return q / max(float(np.linalg.norm(q)), 1e-12)
+    
+    def _cached_answer(self, q: np.ndarray) -> Optional[dict]:
+        """Cached result for a question whose embedding is within ANSWER_CACHE_MIN_SIMILARITY of q"""
+        with self._answer_cache_lock:
+            if not self._answer_cache_results or self._answer_cache_vecs.shape[1] != q.shape[0]:
+                return None
+            sims = self._answer_cache_vecs @ q
+            best = int(np.argmax(sims))
+            if sims[best] >= ANSWER_CACHE_MIN_SIMILARITY:
+                return self._answer_cache_results[best]
+        return None
+    
+    def cached_answer(self, question: str) -> Optional[dict]:
+        """Cached result for a near-duplicate of question, or None (no retrieval or LLM call)"""
+        return self._cached_answer(self._unit_vector(self._query_embedding(question)))
+    
+    def _remember_answer(self, q: np.ndarray, result: dict):
+        """Add a generated answer to the semantic cache, keeping the most recent ANSWER_CACHE_SIZE"""
+        with self._answer_cache_lock:
+            if self._answer_cache_vecs.shape[1] != q.shape[0]:
+                self._answer_cache_vecs = np.empty((0, q.shape[0]), dtype=np.float32)
+            self._answer_cache_vecs = np.vstack([self._answer_cache_vecs, q])[-ANSWER_CACHE_SIZE:]
+            self._answer_cache_results = (self._answer_cache_results + [result])[-ANSWER_CACHE_SIZE:]
+    
+    def _clear_answer_cache(self):
+        """Forget cached answers (they may cite chunks that changed)"""
+        with self._answer_cache_lock:
+            self._answer_cache_vecs = np.empty((0, 0), dtype=np.float32)
+            self._answer_cache_results = []
+    
+    def chat_batch(self, questions: List[str]) -> List[dict]:
+        """Answer several questions with one embedding pass, one vector query and a batched LLM call"""
+        if self.retriever is None:
+            raise ValueError("No documents loaded. Please upload documents first.")
+        
+        query_vectors = self.embeddings.embed_documents([self.normalize_question(q) for q in questions])
+        unit_vectors = [self._unit_vector(query_vector) for query_vector in query_vectors]
+        results = [self._cached_answer(q) for q in unit_vectors]
+        
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            print(f"Searching for {len(misses)} questions in one batch")
+            raw_docs = self._query_collection([query_vectors[i] for i in misses], self.search_k)
+            docs = [self._rerank(questions[i], candidates) for i, candidates in zip(misses, raw_docs)]
+            answers = self.rag_chain.batch([
+                {"context": self._format_context(d), "question": questions[i]}
+                for i, d in zip(misses, docs)
+            ])
+            for i, d, answer in zip(misses, docs, answers):
+                results[i] = {"answer": answer, "context": d}
+                self._remember_answer(unit_vectors[i], results[i])
+        return results
+    
+    def chat(self, question: str, chat_history: List = None) -> dict:
+        """Chat with the RAG system"""
+        query_vector = self._query_embedding(question)
+        q = self._unit_vector(query_vector)
+        cached = self._cached_answer(q)
+        if cached is not None:
+            return cached
+        
+        docs = self.retrieve(question, query_vector)
         
         # Get answer from LLM
         answer = self.rag_chain.invoke({
-            "context": context,
+            "context": self._format_context(docs),
             "question": question
         })
         
-        return {
+        result = {
             "answer": answer,
             "context": docs
         }
+        self._remember_answer(q, result)
+        return result
+    
+    def stream_chat(
+        self, question: str, chat_history: List = None, docs: Optional[List[Document]] = None
+    ) -> Iterator[str]:
+        """Chat that yields answer tokens as the LLM produces them (docs: snippets already from retrieve())"""
+        query_vector = self._query_embedding(question)
+        q = self._unit_vector(query_vector)
+        cached = self._cached_answer(q)
+        if cached is not None:
+            yield cached["answer"]
+            return
+        
+        if docs is None:
+            docs = self.retrieve(question, query_vector)
+        
+        tokens = []
+        for token in self.rag_chain.stream({
+            "context": self._format_context(docs),
+            "question": question
+        }):
+            tokens.append(token)
+            yield token
+        self._remember_answer(q, {"answer": "".join(tokens), "context": docs})
+    
+    async def achat(self, question: str, chat_history: List = None, query_vector: Optional[List[float]] = None) -> dict:
+        """Async chat: retrieval (embedding + search) runs in a worker thread, the LLM call is awaited"""
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(self._query_embedding, question)
+        q = self._unit_vector(query_vector)
+        cached = self._cached_answer(q)
+        if cached is not None:
+            return cached
+        
+        docs = await asyncio.to_thread(self.retrieve, question, query_vector)
+        
+        answer = await self.rag_chain.ainvoke({
+            "context": self._format_context(docs),
+            "question": question
+        })
+        
+        result = {
+            "answer": answer,
+            "context": docs
+        }
+        self._remember_answer(q, result)
+        return result
+    
+    async def astream_chat(
+        self, question: str, chat_history: List = None, query_vector: Optional[List[float]] = None
+    ) -> AsyncIterator[str]:
+        """Async chat that yields answer tokens as the LLM produces them"""
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(self._query_embedding, question)
+        q = self._unit_vector(query_vector)
+        cached = self._cached_answer(q)
+        if cached is not None:
+            yield cached["answer"]
+            return
+        
+        docs = await asyncio.to_thread(self.retrieve, question, query_vector)
+        
+        tokens = []
+        async for token in self.rag_chain.astream({
+            "context": self._format_context(docs),
+            "question": question
+        }):
+            tokens.append(token)
+            yield token
+        self._remember_answer(q, {"answer": "".join(tokens), "context": docs})
     
     def get_document_count(self) -> int:
         """Get number of documents in vector store"""
@@ -316,7 +1164,7 @@ class RAGChatbot:
                 pass
             self.vectorstore = None
             self.retriever = None
-            self.rag_chain = None
+        self._clear_answer_cache()
         
         # Aggressively try to release file locks
         import gc
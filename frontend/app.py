@@ -3,6 +3,7 @@ Streamlit Frontend for RAG Chatbot
 """
 import streamlit as st
 import requests
+import json
 import os
 from pathlib import Path
 
@@ -32,6 +33,24 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def stream_answer(prompt: str, chat_history: list):
+    """Yield answer tokens from the backend's /chat/stream NDJSON lines"""
+    with requests.post(
+        f"{API_URL}/chat/stream",
+        json={"question": prompt, "chat_history": chat_history},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(response.json().get("detail", "Unknown error"))
+        
+        for line in response.iter_lines():
+            if not line:
+                continue
+            payload = json.loads(line)
+            if "error" in payload:
+                raise RuntimeError(payload["error"])
+            yield payload["delta"]
+
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -80,37 +99,21 @@ if prompt := st.chat_input("Ask me anything..."):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get AI response
+    # Get AI response, rendered token by token as it streams in
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = requests.post(
-                    f"{API_URL}/chat",
-                    json={
-                        "question": prompt,
-                        "chat_history": st.session_state.chat_history
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    answer = result["answer"]
-                    
-                    st.markdown(answer)
-                    
-                    # Update chat history
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer
-                    })
-                    st.session_state.chat_history.append({"role": "human", "content": prompt})
-                    st.session_state.chat_history.append({"role": "ai", "content": answer})
-                else:
-                    error_detail = response.json().get("detail", "Unknown error")
-                    st.error(f"❌ Error: {error_detail}")
+        try:
+            answer = st.write_stream(stream_answer(prompt, st.session_state.chat_history))
             
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
+            # Update chat history
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer
+            })
+            st.session_state.chat_history.append({"role": "human", "content": prompt})
+            st.session_state.chat_history.append({"role": "ai", "content": answer})
+        
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
 
 # Footer
 st.divider()
@@ -2,6 +2,8 @@
 Unified Streamlit App for Cloud Deployment
 Directly uses RAGChatbot without needing a separate FastAPI server.
 """
+from __future__ import annotations
+
 # --- SQLite Monkey Patch for Streamlit Cloud (MUST BE AT TOP) ---
 import sys
 try:
@@ -12,15 +14,32 @@ except ImportError:
 # -------------------------------------------------------------
 
 import streamlit as st
+import hashlib
 import os
+from collections import deque
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING
+
+# Paths and deployment mode, resolved once per run instead of at each use
+ROOT = Path(__file__).resolve().parent
+UPLOAD_DIR = ROOT / "backend" / "uploaded_documents"
+# Note: On Streamlit Cloud, we use In-Memory mode to avoid read-only DB errors.
+IS_CLOUD = os.getenv("STREAMLIT_RUNTIME_ENV") == "cloud" or Path("/mount/src").exists()
+# Use None for chroma_persist_dir to trigger In-Memory mode in the cloud
+PERSIST_DIR = None if IS_CLOUD else str(ROOT / "backend" / "chroma_db")
+
+# Add the project root to sys.path for internal imports (once: the script re-runs on every interaction)
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
-# Add the project root to sys.path for internal imports
-sys.path.append(os.getcwd())
+# backend.rag_core (and the LLM/vector libraries behind it) is imported on first use, so the
+# page shell paints before the heavy imports run
+if TYPE_CHECKING:
+    from backend.rag_core import RAGChatbot
 
-from backend.rag_core import RAGChatbot
+# Most recent question/answer pairs kept as LLM chat history (older turns are dropped)
+MAX_TURNS = 8
 
 # Page config
 st.set_page_config(
@@ -29,80 +48,90 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Custom CSS for Accessibility (Optimized Fonts & High Contrast) ---
-st.markdown("""
-<style>
-    /* Global Font Size (Slightly reduced from 1.2rem) */
-    html, body, [class*="st-"] {
-        font-size: 1.1rem !important;
-    }
-    
-    /* Chat Message Font Sizes (Better balance) */
-    .stChatMessage p {
-        font-size: 1.15rem !important;
-        line-height: 1.5 !important;
-    }
-    
-    /* Header Font Sizes */
-    h1 { font-size: 2.2rem !important; }
-    h2 { font-size: 1.8rem !important; }
-    h3 { font-size: 1.4rem !important; }
-    
-    /* Sidebar Accessibility */
-    .stSidebar [data-testid="stSidebarNav"] {
-        font-size: 1.05rem !important;
-    }
-    
-    /* Make buttons distinct but not oversized */
-    .stButton button {
-        height: 2.8em !important;
-        font-size: 1.05rem !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# --- Custom CSS for Accessibility (Optimized Fonts & High Contrast), kept in static/app.css ---
+@st.cache_resource
+def _css() -> str:
+    """Page stylesheet, read from disk once per process (cache_resource returns the same string, no copy)"""
+    return f"<style>\n{(ROOT / 'static' / 'app.css').read_text(encoding='utf-8')}</style>"
+
+st.markdown(_css(), unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner="🚀 Initializing AI Assistant...")
+def get_chatbot(api_key_hash: str, persist_dir: str | None, model_name: str, _api_key: str) -> RAGChatbot:
+    """One RAGChatbot per process, shared by every session and rerun (keyed by key hash, not the key)"""
+    from backend.rag_core import RAGChatbot
+    return RAGChatbot(
+        groq_api_key=_api_key,
+        model_name=model_name,
+        chroma_persist_dir=persist_dir
+    )
+
+def _dir_fingerprint(path: str) -> str:
+    """Hash of every document's (relative path, mtime, size) under path: a stat walk, no reads.
+
+    Per-file entries (not just totals) so a rename or a same-size copy with an older mtime
+    still changes the fingerprint.
+    """
+    from backend.rag_core import iter_documents
+    entries = []
+    for entry in iter_documents(path):
+        stat = entry.stat()
+        entries.append((os.path.relpath(entry.path, path), stat.st_mtime_ns, stat.st_size))
+    return hashlib.sha256(repr(sorted(entries)).encode("utf-8")).hexdigest()
+
+@st.cache_data(show_spinner="📚 Syncing documents...")
+def sync_documents(_chatbot: RAGChatbot, upload_dir: str, fingerprint: str) -> int:
+    """Sync the upload folder; cached on its fingerprint, so it only re-runs when the folder changes"""
+    count = _chatbot.sync_folder(upload_dir, batch_size=256, embed_batch_size=64)
+    _doc_count.clear()
+    return count
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _doc_count(_chatbot: RAGChatbot) -> int:
+    """Indexed chunk count for the sidebar, at most 30s stale (cleared whenever a sync runs)"""
+    return _chatbot.get_document_count()
+
+def buffered(stream, chunks: list):
+    """Pass a token stream through while collecting its chunks (joined once, not concatenated per token)"""
+    for delta in stream:
+        chunks.append(delta)
+        yield delta
 
 # Initialize Session State
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-if "chatbot" not in st.session_state:
-    # 1. Get API Key from Secrets (Cloud) or Env (Local)
-    api_key = st.secrets.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
-    
-    if not api_key:
-        st.info("Please set the GROQ_API_KEY in Streamlit Secrets or .env file.")
-        st.stop()
-    
-    # 2. Initialize the bot
-    # Note: On Streamlit Cloud, we use In-Memory mode to avoid read-only DB errors.
-    with st.spinner("🚀 Initializing AI Assistant..."):
-        # Detect Streamlit Cloud
-        is_cloud = os.getenv("STREAMLIT_RUNTIME_ENV") == "cloud" or os.path.exists("/mount/src")
-        
-        # Use None for chroma_persist_dir to trigger In-Memory mode in the cloud
-        persist_dir = None if is_cloud else "backend/chroma_db"
-        model_name = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
-        
-        chatbot = RAGChatbot(
-            groq_api_key=api_key,
-            model_name=model_name,
-            chroma_persist_dir=persist_dir
-        )
-        
-        # 3. Auto-sync documents on first run
-        upload_dir = os.path.join(os.getcwd(), "backend", "uploaded_documents")
-        if os.path.exists(upload_dir):
-            chatbot.sync_folder(upload_dir)
-            
-        st.session_state.chatbot = chatbot
+st.session_state.setdefault("messages", [])
+st.session_state.setdefault("chat_history", deque(maxlen=2 * MAX_TURNS))
+
+# 1. Get API Key from Secrets (Cloud) or Env (Local)
+@st.cache_resource
+def _groq_api_key() -> str | None:
+    """GROQ_API_KEY from Streamlit secrets or the environment, read once per process"""
+    try:
+        key = st.secrets.get("GROQ_API_KEY")
+    except FileNotFoundError:
+        # No secrets.toml (local runs): fall back to the environment
+        key = None
+    return key or os.getenv("GROQ_API_KEY")
+
+API_KEY = _groq_api_key()
+
+if not API_KEY:
+    st.info("Please set the GROQ_API_KEY in Streamlit Secrets or .env file.")
+    st.stop()
+
+# 2. Get the shared bot
+model_name = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+chatbot = get_chatbot(hashlib.sha256(API_KEY.encode()).hexdigest(), PERSIST_DIR, model_name, API_KEY)
+
+# 3. Auto-sync documents whenever the upload folder changed since the last sync
+if UPLOAD_DIR.exists():
+    sync_documents(chatbot, str(UPLOAD_DIR), _dir_fingerprint(str(UPLOAD_DIR)))
 
 # Sidebar
 with st.sidebar:
     st.title("🤖 Enbridge Bot")
     
     # System status
-    count = st.session_state.chatbot.get_document_count()
+    count = _doc_count(chatbot)
     st.success(f"✅ System Ready")
     st.caption(f"Knowledge Base: {count} snippets active")
     
@@ -110,48 +139,73 @@ with st.sidebar:
     
     if st.button("🗑️ Reset Chat", use_container_width=True):
         st.session_state.messages = []
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=2 * MAX_TURNS)
         st.rerun()
 
 # Main chat interface
 st.title("🤖 Enbridge Assistant")
 
 # --- Simple How-to Guide for Employees ---
-with st.expander("👋 New here? Click for a simple guide", expanded=True):
-    st.markdown("""
+@st.cache_resource
+def _guide_md() -> str:
+    """How-to guide markdown, built once per process"""
+    return """
     **I am here to help you with your tech questions!**
     - ✏️ **Just type** your question in the box at the bottom (for example: *How do I set up my phone?*)
     - ⌨️ **Press Enter** on your keyboard to send it.
     - 👨‍💻 **I will give you a simple answer** to help you get started.
     - 🗑️ **Want to start over?** Click the "Reset Chat" button on the left.
-    """)
+    """
+
+with st.expander("👋 New here? Click for a simple guide", expanded=True):
+    st.markdown(_guide_md())
 
 st.caption("How can I help you today?")
 
-# Display chat messages
-for message in st.session_state.messages:
+def render_message(message: dict):
+    """Draw one chat message"""
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# Chat input
-if prompt := st.chat_input("Ask me anything about Enbridge or tech support..."):
-    # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
+# Display chat messages (full reruns only; remember how many were drawn here)
+for message in st.session_state.messages:
+    render_message(message)
+st.session_state.full_run_count = len(st.session_state.messages)
+
+@st.fragment
+def chat_fragment():
+    """Chat input and answer: a submit reruns only this fragment, not the whole history above"""
+    # Exchanges from earlier fragment reruns, which the full-run history loop has not drawn
+    for message in st.session_state.messages[st.session_state.full_run_count:]:
+        render_message(message)
     
-    # Get AI response
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
+    # Chat input
+    if prompt := st.chat_input("Ask me anything about Enbridge or tech support..."):
+        # Add user message
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        
+        # Get AI response, rendered token by token as the LLM generates it
+        with st.chat_message("assistant"):
             try:
-                # Use the local chatbot instance directly
-                result = st.session_state.chatbot.chat(
-                    question=prompt,
-                    chat_history=st.session_state.chat_history
-                )
+                # Retrieval first, under a collapsed status that reports what was found
+                # (skipped for a cached answer, which stream_chat replays without searching)
+                sources = None
+                if chatbot.cached_answer(prompt) is None:
+                    with st.status("Thinking…", expanded=False) as status:
+                        sources = chatbot.retrieve(prompt)
+                        n_sources = len({doc.metadata.get("source") for doc in sources})
+                        status.update(label=f"Found {n_sources} sources", state="complete")
                 
-                answer = result["answer"]
-                st.markdown(answer)
+                # Use the local chatbot instance directly; the answer is joined once from the buffer
+                chunks: list[str] = []
+                st.write_stream(buffered(chatbot.stream_chat(
+                    question=prompt,
+                    chat_history=list(st.session_state.chat_history),
+                    docs=sources
+                ), chunks))
+                answer = "".join(chunks)
                 
                 # Update history
                 st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -161,6 +215,8 @@ if prompt := st.chat_input("Ask me anything about Enbridge or tech support..."):
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
 
+chat_fragment()
+
 # Footer
 st.divider()
 st.caption("Powered by Llama 3.3 & Enbridge Technical Data")
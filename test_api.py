@@ -1,63 +1,121 @@
+import concurrent.futures
 import requests
-import json
 import time
 
+# orjson (faster, encodes straight to bytes) when installed, otherwise the stdlib json module
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    import json
+    
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    
+    json_loads = json.loads
+
 BASE_URL = "http://localhost:8000"
 
-def test_api():
-    print("--- 🤖 Enbridge Bot API Local Test ---")
-    
-    # 1. Root Check
-    print("\n1. Checking API Root...")
-    try:
-        r = requests.get(f"{BASE_URL}/")
-        print(f"Status: {r.status_code}")
-        print(f"Response: {r.json()}")
-    except Exception as e:
-        print(f"Error: {e}")
-        return
+# One keep-alive session so every call reuses the same pooled connection
+# (bodies are pre-encoded to JSON bytes, hence the session-wide JSON Content-Type)
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
 
-    # 2. System Status
-    print("\n2. Checking System Status...")
-    r = requests.get(f"{BASE_URL}/status")
-    print(f"Status: {r.status_code}")
-    print(f"Response: {r.json()}")
+def _show_body(body):
+    """Report line for a probe: the whole decoded body"""
+    return f"Response: {body}"
 
-    # 3. List Documents
-    print("\n3. Listing Documents...")
-    r = requests.get(f"{BASE_URL}/documents")
-    print(f"Status: {r.status_code}")
-    docs = r.json().get("documents", [])
-    print(f"Found {len(docs)} documents.")
+def _count_documents(body):
+    """Report line for /documents: just how many documents are indexed"""
+    return f"Found {len(body.get('documents', []))} documents."
+
+# Independent probes: (name, method, path, report line for the decoded body)
+PROBES = [
+    ("1. API Root", "GET", "/", _show_body),
+    ("2. System Status", "GET", "/status", _show_body),
+    ("3. List Documents", "GET", "/documents", _count_documents),
+    ("4. Manual Sync", "POST", "/sync", _show_body),
+]
+
+# Chat cases: (name, question, print the answer summary and sources rather than the full answer)
+CHAT_CASES = [
+    ("5. Testing Chat (Laptop Setup)", "how do I setup my enbridge laptop?", True),
+    ("6. Testing Ambiguity Rule", "setup my device", False),
+]
 
-    # 4. Manual Sync
-    print("\n4. Triggering Manual Sync...")
-    r = requests.post(f"{BASE_URL}/sync")
+def _probe(name, method, path, **kwargs):
+    """Send one request; returns (name, response) so results can be reported as they complete"""
+    return name, SESSION.request(method, f"{BASE_URL}{path}", **kwargs)
+
+def _report_probe(name, r, describe):
+    """Print a probe's status and its report line"""
+    print(f"\n{name}")
     print(f"Status: {r.status_code}")
-    print(f"Response: {r.json()}")
-
-    # 5. Test Chat (Laptop)
-    print("\n5. Testing Chat (Laptop Setup)...")
-    payload = {
-        "question": "how do I setup my enbridge laptop?",
-        "chat_history": []
-    }
-    r = requests.post(f"{BASE_URL}/chat", json=payload)
+    print(describe(json_loads(r.content)))
+
+def _chat(name, question, summary):
+    """Ask one question with an empty history and print the answer"""
+    print(f"\n{name}...")
+    payload = {"question": question, "chat_history": []}
+    _, r = _probe(name, "POST", "/chat", data=json_dumps(payload))
     print(f"Status: {r.status_code}")
-    if r.status_code == 200:
-        result = r.json()
+    if r.status_code != 200:
+        return
+    result = json_loads(r.content)
+    if summary:
         print("\nAnswer Summary:")
         print(result["answer"][:300] + "...")
         print("\nSources Found:")
         print(result["sources"])
+    else:
+        print(f"Response: {result['answer']}")
+
+def _chat_stream(name, question):
+    """Ask one question on /chat/stream and print each NDJSON delta as it arrives"""
+    print(f"\n{name}...")
+    payload = {"question": question, "chat_history": []}
+    with SESSION.post(f"{BASE_URL}/chat/stream", data=json_dumps(payload), stream=True) as r:
+        print(f"Status: {r.status_code}")
+        if r.status_code != 200:
+            return
+        for line in r.iter_lines():
+            if not line:
+                continue
+            obj = json_loads(line)
+            if "error" in obj:
+                print(f"\nError: {obj['error']}")
+                return
+            print(obj["delta"], end="", flush=True)
+    print()
+
+def test_api():
+    print("--- 🤖 Enbridge Bot API Local Test ---")
     
-    # 6. Test Ambiguity
-    print("\n6. Testing Ambiguity Rule...")
-    payload = {"question": "setup my device", "chat_history": []}
-    r = requests.post(f"{BASE_URL}/chat", json=payload)
-    print(f"Status: {r.status_code}")
-    if r.status_code == 200:
-        print(f"Response: {r.json()['answer']}")
+    # 1-4. Independent probes (root, status, documents, manual sync) run concurrently
+    print("\nRunning API probes (root, status, documents, sync)...")
+    failed = False
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(PROBES)) as pool:
+        futures = {
+            pool.submit(_probe, name, method, path): (name, describe)
+            for name, method, path, describe in PROBES
+        }
+        for future in concurrent.futures.as_completed(futures):
+            name, describe = futures[future]
+            try:
+                _report_probe(*future.result(), describe)
+            except Exception as e:
+                print(f"\n{name}")
+                print(f"Error: {e}")
+                failed = True
+    if failed:
+        return
+
+    # 5-6. Chat calls stay sequential: they depend on the synced RAG state
+    for name, question, summary in CHAT_CASES:
+        _chat(name, question, summary)
+    
+    # 7. Streaming chat: tokens print as they arrive instead of after the full response
+    _chat_stream("7. Testing Streaming Chat", "how do I setup my enbridge laptop?")
 
 if __name__ == "__main__":
-    test_api()
+    with SESSION:
+        test_api()